@@ -0,0 +1,120 @@
+import re
+
+from response_policy import DEFAULT_POLICY, RESPONSE_POLICIES
+
+# tomllib is in the standard library from Python 3.11; older versions use tomli
+try:
+    import tomllib
+except ImportError:
+    import tomli as tomllib
+
+REQUIRED_FIELDS = ("id", "name", "description", "icon", "color", "system_prompt")
+OPTIONAL_FIELDS = ("keywords", "use_web_search", "search_hint", "response_length", "default")
+COLOR_PATTERN = re.compile(r"^#[0-9A-Fa-f]{6}$")
+
+
+class AgentRegistry:
+    """Agents indexed by id and name, plus keyword-based routing."""
+
+    def __init__(self, agents, default_agent):
+        self.agents = list(agents)
+        self.default = default_agent
+        self.by_id = {agent.id: agent for agent in self.agents}
+        self.by_name = {agent.name: agent for agent in self.agents}
+
+        # Keywords match at the start of a word, so "program" matches "programming"
+        # but "api" doesn't match "capital"
+        self._keyword_patterns = {
+            agent.id: [re.compile(r"\b" + re.escape(word)) for word in agent.keywords]
+            for agent in self.agents
+        }
+
+    def __iter__(self):
+        return iter(self.agents)
+
+    def __len__(self):
+        return len(self.agents)
+
+    def get(self, name):
+        """Look up an agent by name, returning None if there is no such agent."""
+        return self.by_name.get(name)
+
+    def select(self, query):
+        """Pick the agent whose keywords match the query most often, or the default agent."""
+        low_query = query.lower()
+        best_agent = None
+        best_count = 0
+        tie = False
+        for agent in self.agents:
+            count = sum(1 for pattern in self._keyword_patterns[agent.id] if pattern.search(low_query))
+            if count > best_count:
+                best_agent, best_count, tie = agent, count, False
+            elif count and count == best_count:
+                tie = True
+
+        # Without a clear winner fall back to the default agent
+        if best_agent is None or tie:
+            return self.default
+        return best_agent
+
+
+def validate_agent_specs(specs):
+    """Check agent definitions loaded from config, raising ValueError on the first problem."""
+    if not specs:
+        raise ValueError("No agents defined")
+
+    seen_ids = set()
+    seen_names = set()
+    defaults = []
+    for index, spec in enumerate(specs):
+        label = spec.get("id", f"#{index}")
+        missing = [field for field in REQUIRED_FIELDS if not spec.get(field)]
+        if missing:
+            raise ValueError(f"Agent {label} is missing {', '.join(missing)}")
+        unknown = set(spec) - set(REQUIRED_FIELDS) - set(OPTIONAL_FIELDS)
+        if unknown:
+            raise ValueError(f"Agent {label} has unknown fields: {', '.join(sorted(unknown))}")
+        if spec["id"] in seen_ids:
+            raise ValueError(f"Duplicate agent id: {spec['id']}")
+        if spec["name"] in seen_names:
+            raise ValueError(f"Duplicate agent name: {spec['name']}")
+        if not COLOR_PATTERN.match(spec["color"]):
+            raise ValueError(f"Agent {label} has an invalid color: {spec['color']}")
+        if spec.get("response_length", DEFAULT_POLICY) not in RESPONSE_POLICIES:
+            raise ValueError(f"Agent {label} has an unknown response_length: {spec['response_length']}")
+        seen_ids.add(spec["id"])
+        seen_names.add(spec["name"])
+        if spec.get("default"):
+            defaults.append(spec["id"])
+
+    if len(defaults) != 1:
+        raise ValueError(f"Exactly one agent must be marked default, found {len(defaults)}")
+
+
+def load_agent_registry(path, agent_factory):
+    """Load, validate and index agent definitions from a TOML file."""
+    with open(path, "rb") as f:
+        specs = tomllib.load(f).get("agents", [])
+
+    validate_agent_specs(specs)
+
+    agents = []
+    default_agent = None
+    for spec in specs:
+        agent = agent_factory(
+            spec["name"],
+            spec["description"],
+            spec["system_prompt"],
+            spec["icon"],
+            spec["color"],
+            agent_id=spec["id"],
+            keywords=[word.lower() for word in spec.get("keywords", [])],
+            use_web_search=spec.get("use_web_search", False),
+            search_hint=spec.get("search_hint", ""),
+            response_length=spec.get("response_length", DEFAULT_POLICY)
+        )
+        agents.append(agent)
+        if spec.get("default"):
+            default_agent = agent
+
+    return AgentRegistry(agents, default_agent)
@@ -0,0 +1,199 @@
+"""Headless batch evaluation of routing and responses over a JSONL corpus.
+
+Each input line is a JSON object with the query in "query" (or "title" and
+"body", as in requests.jsonl), an optional id ("id" or "request_id") and an
+optional "expected_agent" for routing accuracy. Results are appended to the
+output file as they complete, so an interrupted run resumes where it left off.
+
+Usage:
+    python batch_eval.py corpus.jsonl results.jsonl --workers 4 --mock
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from response_policy import summarize_by_policy
+
+
+def iter_corpus(path):
+    """Yield (item id, query, expected agent) for every line of a JSONL corpus."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            query = record.get("query")
+            if query is None:
+                query = "\n\n".join(part for part in (record.get("title"), record.get("body")) if part)
+            item_id = str(record.get("id") or record.get("request_id") or line_number)
+            yield item_id, query, record.get("expected_agent")
+
+
+def load_checkpoint(path):
+    """Return the results already written to the output file, keyed by item id."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a partial last line
+                continue
+            if result.get("error"):
+                # Failed items, including API errors reported as "Error: ..." replies, are retried
+                done.pop(result["id"], None)
+                continue
+            done[result["id"]] = result
+    return done
+
+
+def repair_checkpoint(path):
+    """Truncate a partial last line left by an interrupted run so new results start on a fresh line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def run_item(app, item_id, query, expected_agent):
+    """Route and answer one query, returning its result record."""
+    stats = {}
+    start = time.perf_counter()
+    response, agent = asyncio.run(app.route_query(query, f"batch-{item_id}", [], stats=stats))
+    latency = time.perf_counter() - start
+    return {
+        "id": item_id,
+        "query": query,
+        "agent": agent.name,
+        "expected_agent": expected_agent,
+        "response": response,
+        "error": response.startswith("Error: "),
+        "latency": round(latency, 4),
+        "stats": stats,
+    }
+
+
+def error_record(item_id, query, expected_agent, exc):
+    """Result record for an item whose processing raised."""
+    return {
+        "id": item_id,
+        "query": query,
+        "agent": None,
+        "expected_agent": expected_agent,
+        "response": f"Error: {exc}",
+        "error": True,
+        "exception": type(exc).__name__,
+        "latency": None,
+        "stats": {},
+    }
+
+
+def summarize(results):
+    """Compute latency, routing accuracy and per-policy costs for a list of results."""
+    summary = {"count": len(results), "errors": sum(1 for r in results if r["error"])}
+
+    latencies = sorted(r["latency"] for r in results if r["latency"] is not None)
+    if latencies:
+        summary["latency_p50"] = round(statistics.median(latencies), 4)
+        summary["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4)
+
+    labelled = [r for r in results if r.get("expected_agent")]
+    if labelled:
+        correct = sum(1 for r in labelled if r["agent"] == r["expected_agent"])
+        summary["routing_accuracy"] = round(correct / len(labelled), 4)
+
+    summary["by_response_policy"] = summarize_by_policy(r["stats"] for r in results)
+    return summary
+
+
+def run_batch(app, corpus_path, output_path, workers=4, limit=None):
+    """Run every pending corpus item through the app and append results to output_path."""
+    done = load_checkpoint(output_path)
+    repair_checkpoint(output_path)
+    results = []
+    write_lock = threading.Lock()
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        items = {}
+
+        def record(future):
+            item = items.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # One failing item must not abort the batch
+                result = error_record(*item, e)
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                results.append(result)
+
+        submitted = 0
+        for item_id, query, expected_agent in iter_corpus(corpus_path):
+            if item_id in done:
+                continue
+            if limit is not None and submitted >= limit:
+                break
+
+            # Keep a bounded number of items in flight so large corpora stream through
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future)
+
+            future = pool.submit(run_item, app, item_id, query, expected_agent)
+            items[future] = (item_id, query, expected_agent)
+            pending.add(future)
+            submitted += 1
+
+        for future in wait(pending).done:
+            record(future)
+
+    elapsed = time.perf_counter() - start
+
+    # Report on the whole corpus, including items finished by earlier runs
+    summary = summarize(list(done.values()) + results)
+    summary["processed"] = len(results)
+    summary["skipped"] = len(done)
+    if elapsed > 0:
+        summary["throughput_per_second"] = round(len(results) / elapsed, 3)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL corpus of queries through the agents")
+    parser.add_argument("corpus", help="Input JSONL corpus")
+    parser.add_argument("output", help="Output JSONL file, appended to and used as the checkpoint")
+    parser.add_argument("--workers", type=int, default=4, help="Number of queries processed concurrently")
+    parser.add_argument("--limit", type=int, help="Process at most this many new items")
+    parser.add_argument("--mock", action="store_true", help="Use the offline mock LLM and stub search backends")
+    args = parser.parse_args(argv)
+
+    if args.mock:
+        os.environ["LLM_BACKEND"] = "mock"
+        os.environ.setdefault("SEARCH_BACKEND", "stub")
+
+    # Imported after the environment is set up so the backends pick it up
+    import final_chat_app_with_history as app
+    app.warm_up()
+
+    summary = run_batch(app, args.corpus, args.output, args.workers, args.limit)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
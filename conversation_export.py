@@ -0,0 +1,214 @@
+"""Streaming export and import of conversation history.
+
+Conversations are written one record per line (JSONL) or one object per
+frame (msgpack), so memory use stays flat regardless of history size.
+
+Usage:
+    python conversation_export.py export --user KEY history.jsonl
+    python conversation_export.py import --user KEY history.jsonl
+    python conversation_export.py convert history.jsonl history.msgpack
+
+export and import talk to the shared store named by SHARED_STATE_URL or
+--store-url, without starting Streamlit.
+"""
+import argparse
+import json
+import os
+import sys
+
+import environment  # noqa: F401
+from conversation_storage import compress_conversation, get_conversation_messages
+from shared_state import SharedStateStore, connect
+
+FORMATS = ("jsonl", "msgpack")
+
+
+def _require_msgpack():
+    # msgpack is optional and only imported when the msgpack format is used
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError("msgpack is required for the msgpack format (pip install msgpack)")
+    return msgpack
+
+
+def iter_export_records(conversations, session_id=None):
+    """Yield one export record per conversation, decompressing one at a time.
+
+    conversations is a conversation history dict or an iterable of (id, entry) pairs.
+    """
+    if hasattr(conversations, "items"):
+        conversations = conversations.items()
+    for conv_id, conv_data in conversations:
+        yield {
+            "id": conv_id,
+            "session_id": session_id,
+            "title": conv_data.get("title", ""),
+            "timestamp": conv_data.get("timestamp", ""),
+            "last_active": conv_data.get("last_active"),
+            "messages": get_conversation_messages(conv_id, conv_data),
+        }
+
+
+def iter_encoded_records(records, fmt="jsonl"):
+    """Encode records into bytes chunks in the given format."""
+    if fmt == "msgpack":
+        packer = _require_msgpack().Packer()
+        for record in records:
+            yield packer.pack(record)
+    elif fmt == "jsonl":
+        for record in records:
+            yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def write_records(records, fp, fmt="jsonl"):
+    """Write records to a binary file object and return how many were written."""
+    count = 0
+    for chunk in iter_encoded_records(records, fmt):
+        fp.write(chunk)
+        count += 1
+    return count
+
+
+def iter_import_records(fp, fmt="jsonl"):
+    """Yield records from a binary file object in the given format."""
+    if fmt == "msgpack":
+        for record in _require_msgpack().Unpacker(fp, raw=False):
+            yield record
+    elif fmt == "jsonl":
+        for line in fp:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+MESSAGE_ROLES = ("user", "assistant")
+
+
+def is_valid_message(message):
+    """Return True if a message can be rendered by the chat pane."""
+    return (
+        isinstance(message, dict)
+        and message.get("role") in MESSAGE_ROLES
+        and isinstance(message.get("content"), str)
+    )
+
+
+def is_valid_record(record):
+    """Return True if an imported record has the fields needed to restore a conversation."""
+    return (
+        isinstance(record, dict)
+        and isinstance(record.get("id"), str)
+        and bool(record["id"])
+        and isinstance(record.get("messages", []), list)
+        and all(is_valid_message(m) for m in record.get("messages", []))
+    )
+
+
+def _string_field(record, name, default):
+    value = record.get(name)
+    return value if isinstance(value, str) and value else default
+
+
+def import_records(records, conversation_history, compress=False):
+    """Add imported records to a conversation history dict.
+
+    Records without an id or with malformed messages are skipped, and a
+    missing or non-string title or timestamp is replaced by a default. With
+    compress, each entry is compressed as soon as it is added. Returns a
+    (added, skipped) pair of counts.
+    """
+    added = 0
+    skipped = 0
+    for record in records:
+        if not is_valid_record(record):
+            skipped += 1
+            continue
+        last_active = record.get("last_active")
+        if isinstance(last_active, bool) or not isinstance(last_active, (int, float)):
+            # Imported conversations count as idle so they get compressed
+            last_active = 0
+        conversation_history[record["id"]] = {
+            "title": _string_field(record, "title", "Untitled Chat"),
+            "messages": record.get("messages", []),
+            # The sidebar sorts on the timestamp, so it must always be a string
+            "timestamp": _string_field(record, "timestamp", ""),
+            "last_active": last_active,
+        }
+        if compress:
+            compress_conversation(conversation_history[record["id"]])
+        added += 1
+    return added, skipped
+
+
+def format_from_path(path):
+    """Guess the format from a file extension."""
+    return "msgpack" if path.endswith((".msgpack", ".mpk")) else "jsonl"
+
+
+def _open(path, mode):
+    if path == "-":
+        return sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+    return open(path, mode)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and import conversation history")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert an export file between formats")
+    convert.add_argument("input", help="Input file, or - for stdin")
+    convert.add_argument("output", help="Output file, or - for stdout")
+    convert.add_argument("--from", dest="input_format", choices=FORMATS)
+    convert.add_argument("--to", dest="output_format", choices=FORMATS)
+
+    for name in ("export", "import"):
+        command = subparsers.add_parser(name, help=f"{name.capitalize()} a user's conversations from the shared store")
+        command.add_argument("path", help="Export file, or - for stdin/stdout")
+        command.add_argument("--user", required=True, help="User or session key")
+        command.add_argument("--store-url", default=os.environ.get("SHARED_STATE_URL", ""))
+        command.add_argument("--format", choices=FORMATS)
+
+    args = parser.parse_args(argv)
+
+    if args.command in ("export", "import"):
+        if not args.store_url:
+            parser.error("--store-url or SHARED_STATE_URL is required")
+        store = SharedStateStore(connect(args.store_url))
+        fmt = args.format or format_from_path(args.path)
+
+        if args.command == "export":
+            records = iter_export_records(store.iter_conversations(args.user), args.user)
+            with _open(args.path, "wb") as dst:
+                count = write_records(records, dst, fmt)
+            print(f"Exported {count} conversations", file=sys.stderr)
+        else:
+            count = 0
+            skipped = 0
+            with _open(args.path, "rb") as src:
+                # Import one record at a time so memory stays flat
+                for record in iter_import_records(src, fmt):
+                    imported = {}
+                    added, invalid = import_records([record], imported)
+                    skipped += invalid
+                    for conv_id, conv_data in imported.items():
+                        store.save_conversation(args.user, conv_id, conv_data)
+                    count += added
+            print(f"Imported {count} conversations, skipped {skipped} invalid records", file=sys.stderr)
+
+    elif args.command == "convert":
+        input_format = args.input_format or format_from_path(args.input)
+        output_format = args.output_format or format_from_path(args.output)
+        with _open(args.input, "rb") as src, _open(args.output, "wb") as dst:
+            count = write_records(iter_import_records(src, input_format), dst, output_format)
+        print(f"Converted {count} conversations", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,16 @@
 import streamlit as st
+import heapq
+import os
+import tempfile
 import uuid
 import time
 
+from conversation_export import (
+    format_from_path, import_records, iter_export_records, iter_import_records, write_records
+)
+from conversation_storage import HotConversationCache, compress_idle_conversations, get_conversation_messages
+from shared_state import SESSION_FIELDS, get_shared_store
+
 def initialize_conversation_state():
     """Initialize session state variables for conversation history."""
     if 'initialized' not in st.session_state:
@@ -13,6 +22,60 @@ def initialize_conversation_state():
         st.session_state.conversation_title = ""
         st.session_state.current_conversation_id = str(uuid.uuid4())
         st.session_state.conversation_history = {}
+        st.session_state.hot_conversations = HotConversationCache()
+        
+        # In shared-state mode, pick up where this user left off on any replica
+        store = get_shared_store()
+        if store is not None:
+            rehydrate_conversation_state(store, get_user_key())
+
+# Request header holding the user id set by an authenticating reverse proxy, e.g.
+# X-Forwarded-Email from oauth2-proxy. When unset, users are keyed by the session URL
+USER_HEADER = os.environ.get("SHARED_STATE_USER_HEADER", "")
+
+def get_user_key():
+    """Return a stable key for this user so any replica can find the session.
+    
+    With USER_HEADER set, this is the user id the proxy authenticated. Otherwise it is
+    the random session query parameter, which then works as a bearer token: anyone
+    with the URL can read and change that history.
+    """
+    if USER_HEADER:
+        user_id = st.context.headers.get(USER_HEADER)
+        if not user_id:
+            st.error("You need to sign in to use this app.")
+            st.stop()
+        return f"user:{user_id}"
+    
+    user_key = st.query_params.get("session")
+    if not user_key:
+        user_key = str(uuid.uuid4())
+        st.query_params["session"] = user_key
+    return user_key
+
+def rehydrate_conversation_state(store, user_key):
+    """Restore conversations and session fields for a user from the shared store."""
+    st.session_state.session_id = user_key
+    st.session_state.conversation_history = store.load_conversations(user_key)
+    for name, value in store.load_session(user_key).items():
+        if name in SESSION_FIELDS:
+            st.session_state[name] = value
+    
+    # Reopen the conversation the user was in
+    conv_id = st.session_state.current_conversation_id
+    conv_data = st.session_state.conversation_history.get(conv_id)
+    if conv_data:
+        messages = get_conversation_messages(conv_id, conv_data, st.session_state.hot_conversations)
+        st.session_state.messages = messages.copy()
+
+def persist_session_state():
+    """Write the session fields to the shared store, if one is configured."""
+    store = get_shared_store()
+    if store is not None:
+        store.save_session(
+            st.session_state.session_id,
+            {name: st.session_state.get(name) for name in SESSION_FIELDS}
+        )
 
 def save_conversation(conversation_id, title, messages):
     """Save the current conversation to history."""
@@ -30,14 +93,31 @@ def save_conversation(conversation_id, title, messages):
         else:
             title = "Untitled Chat"
             
-    st.session_state.conversation_history[conversation_id] = {
+    conv_data = {
         'title': title,
         'messages': messages.copy(),
-        'timestamp': time.strftime("%Y-%m-%d %H:%M")
+        'timestamp': time.strftime("%Y-%m-%d %H:%M"),
+        'last_active': time.time()
     }
+    st.session_state.conversation_history[conversation_id] = conv_data
+    
+    # Write through to the shared store so other replicas see it
+    store = get_shared_store()
+    if store is not None:
+        store.save_conversation(st.session_state.session_id, conversation_id, conv_data)
+    
+    # Drop any stale decompressed copy of this conversation
+    if "hot_conversations" in st.session_state:
+        st.session_state.hot_conversations.discard(conversation_id)
 
+@st.fragment
 def render_conversation_history_sidebar():
-    """Render the conversation history in the sidebar."""
+    """Render the conversation history in the sidebar.
+    
+    Runs as a fragment so that sidebar-only interactions such as export and
+    import don't rerun the whole app; New Chat and Load change the chat pane
+    and still trigger a full rerun.
+    """
     # Add New Chat button at the top
     if st.button("📝 New Chat", key="new_chat_button", use_container_width=True):
         # Save current conversation if it has messages
@@ -59,16 +139,23 @@ def render_conversation_history_sidebar():
     
     # Display conversation history if available
     if st.session_state.conversation_history:
+        # Compress conversations nobody has touched in a while
+        compress_idle_conversations(
+            st.session_state.conversation_history,
+            time.time(),
+            skip_id=st.session_state.current_conversation_id
+        )
+        
         st.markdown("<h3 style='color: #333333; margin-bottom: 15px;'>Conversation History</h3>", unsafe_allow_html=True)
         
-        # Display most recent conversations first
-        sorted_convs = sorted(
-            st.session_state.conversation_history.items(), 
-            key=lambda x: x[1]['timestamp'], 
-            reverse=True
+        # Display most recent conversations first, without sorting the whole history
+        recent_convs = heapq.nlargest(
+            5,  # Show up to 5 most recent conversations
+            st.session_state.conversation_history.items(),
+            key=lambda x: x[1]['timestamp']
         )
         
-        for i, (conv_id, conv_data) in enumerate(sorted_convs[:5]):  # Show up to 5 most recent conversations
+        for i, (conv_id, conv_data) in enumerate(recent_convs):
             # Highlight current conversation
             is_current = conv_id == st.session_state.current_conversation_id
             
@@ -98,9 +185,62 @@ def render_conversation_history_sidebar():
                             
                             # Load the selected conversation
                             st.session_state.current_conversation_id = conv_id
-                            st.session_state.messages = conv_data['messages'].copy()
+                            messages = get_conversation_messages(
+                                conv_id, conv_data, st.session_state.hot_conversations
+                            )
+                            st.session_state.messages = messages.copy()
                             st.session_state.conversation_title = conv_data['title']
                             st.rerun()
+    
+    # Bulk export and import of all conversations
+    with st.expander("Backup"):
+        # Build the export only for the click that asks for it; nothing is kept in session state.
+        # Records are decompressed and written one at a time to a temporary file, which
+        # Streamlit then reads once to serve the download.
+        if st.button("Prepare Export", key="prepare_export", use_container_width=True):
+            records = iter_export_records(
+                st.session_state.conversation_history, st.session_state.session_id
+            )
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "conversations.jsonl")
+                with open(path, "wb") as fp:
+                    write_records(records, fp)
+                with open(path, "rb") as fp:
+                    st.download_button(
+                        "Download JSONL",
+                        data=fp,
+                        file_name="conversations.jsonl",
+                        mime="application/jsonl",
+                        use_container_width=True
+                    )
+        
+        if "import_notice" in st.session_state:
+            st.caption(st.session_state.pop("import_notice"))
+        
+        uploaded = st.file_uploader("Import conversations", type=["jsonl", "msgpack"], key="import_file")
+        if uploaded is not None and st.button("Import", key="import_button", use_container_width=True):
+            # Imported conversations are compressed as they are read
+            imported = {}
+            added, skipped = import_records(
+                iter_import_records(uploaded, format_from_path(uploaded.name)), imported, compress=True
+            )
+            
+            # Never overwrite the conversation that is open in the chat pane
+            current_id = st.session_state.current_conversation_id
+            if st.session_state.messages and imported.pop(current_id, None) is not None:
+                added -= 1
+                skipped += 1
+            
+            st.session_state.conversation_history.update(imported)
+            store = get_shared_store()
+            for conv_id, conv_data in imported.items():
+                # Drop stale decompressed copies of replaced conversations
+                st.session_state.hot_conversations.discard(conv_id)
+                if store is not None:
+                    store.save_conversation(st.session_state.session_id, conv_id, conv_data)
+            
+            st.session_state.import_notice = f"Imported {added} conversations, skipped {skipped}"
+            st.rerun()
 
 # Demo app to show how to use this component
 def main():
@@ -0,0 +1,102 @@
+import json
+import os
+import zlib
+from collections import OrderedDict
+
+# zstandard is optional; fall back to zlib from the standard library
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Conversations untouched for this many seconds are compressed
+COMPRESS_AFTER_SECONDS = int(os.environ.get("CONVERSATION_COMPRESS_AFTER_SECONDS", "600"))
+
+# Number of decompressed conversations kept around for fast reloading
+HOT_CACHE_SIZE = int(os.environ.get("CONVERSATION_HOT_CACHE_SIZE", "3"))
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+def compress_messages(messages, codec=DEFAULT_CODEC):
+    """Serialize and compress a list of chat messages."""
+    raw = json.dumps(messages, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return zlib.compress(raw, 9)
+
+
+def decompress_messages(blob, codec=DEFAULT_CODEC):
+    """Decompress a blob produced by compress_messages back into messages."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed conversations")
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        raw = zlib.decompress(blob)
+    return json.loads(raw.decode("utf-8"))
+
+
+def is_compressed(conv_data):
+    """Return True if a conversation entry only holds compressed messages."""
+    return "compressed_messages" in conv_data
+
+
+def compress_conversation(conv_data):
+    """Replace the messages of a conversation entry with a compressed blob in place."""
+    if is_compressed(conv_data):
+        return
+    conv_data["compressed_messages"] = compress_messages(conv_data["messages"])
+    conv_data["codec"] = DEFAULT_CODEC
+    del conv_data["messages"]
+
+
+class HotConversationCache:
+    """Small LRU of decompressed conversations, keyed by conversation id."""
+
+    def __init__(self, max_size=HOT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def get(self, conv_id):
+        messages = self._items.get(conv_id)
+        if messages is not None:
+            self._items.move_to_end(conv_id)
+        return messages
+
+    def put(self, conv_id, messages):
+        self._items[conv_id] = messages
+        self._items.move_to_end(conv_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def discard(self, conv_id):
+        self._items.pop(conv_id, None)
+
+
+def get_conversation_messages(conv_id, conv_data, hot_cache=None):
+    """Return the messages of a conversation entry, decompressing lazily if needed."""
+    if not is_compressed(conv_data):
+        return conv_data["messages"]
+
+    if hot_cache is not None:
+        messages = hot_cache.get(conv_id)
+        if messages is not None:
+            return messages
+
+    messages = decompress_messages(conv_data["compressed_messages"], conv_data.get("codec", "zlib"))
+    if hot_cache is not None:
+        hot_cache.put(conv_id, messages)
+    return messages
+
+
+def compress_idle_conversations(conversation_history, now, skip_id=None, idle_seconds=COMPRESS_AFTER_SECONDS):
+    """Compress every conversation that has been idle for longer than idle_seconds."""
+    compressed = 0
+    for conv_id, conv_data in conversation_history.items():
+        if conv_id == skip_id or is_compressed(conv_data):
+            continue
+        if now - conv_data.get("last_active", 0) >= idle_seconds:
+            compress_conversation(conv_data)
+            compressed += 1
+    return compressed
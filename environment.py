@@ -0,0 +1,8 @@
+"""Load environment variables from the .env file.
+
+Imported before the app's own modules, several of which read their settings
+when they are imported. Python caches the import, so this runs once per process.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
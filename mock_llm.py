@@ -0,0 +1,36 @@
+import os
+import time
+
+from prompt_cache import TOKENS_PER_REPLY, count_message_tokens, count_tokens
+
+# Simulated generation latency in seconds, to make throughput runs realistic
+MOCK_LLM_LATENCY = float(os.environ.get("MOCK_LLM_LATENCY", "0"))
+
+
+class _Response(dict):
+    """Dict with attribute access, shaped like the openai 0.28 response objects."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class MockChatCompletion:
+    """Deterministic, offline stand-in for openai.ChatCompletion."""
+
+    @staticmethod
+    def create(model, messages, max_tokens=None, **kwargs):
+        query = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        content = f"Mock response from {model} to: {query}"
+        if MOCK_LLM_LATENCY:
+            time.sleep(MOCK_LLM_LATENCY)
+
+        return _Response(
+            choices=[_Response(message=_Response(role="assistant", content=content), finish_reason="stop")],
+            usage=_Response(
+                prompt_tokens=count_message_tokens(messages, model) + TOKENS_PER_REPLY,
+                completion_tokens=count_tokens(content, model)
+            )
+        )
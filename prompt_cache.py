@@ -0,0 +1,71 @@
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Extra tokens the chat format adds per message and per reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 2
+
+# Shortest prompt prefix the provider will cache; shorter prefixes are never served from cache
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    """Return a tiktoken encoding for the model, or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="gpt-4"):
+    """Count tokens with tiktoken when installed, otherwise estimate (about four characters per token)."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages, model="gpt-4"):
+    """Count the prompt tokens of a list of chat messages, excluding the reply priming."""
+    return sum(count_tokens(m["content"], model) + TOKENS_PER_MESSAGE for m in messages)
+
+
+def build_prompt_report(prefix_tokens, messages, usage=None, model="gpt-4"):
+    """Summarize how much of a prompt was a static prefix long enough for the provider to cache."""
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+
+    # Prefer the provider's own count and only tokenize the prompt when it is missing
+    prompt_tokens = usage.get("prompt_tokens")
+    if prompt_tokens is None:
+        prompt_tokens = count_message_tokens(messages, model) + TOKENS_PER_REPLY
+
+    report = {
+        "prompt_tokens": prompt_tokens,
+        "cacheable_prompt_tokens": prefix_tokens if prefix_tokens >= PROMPT_CACHE_MIN_TOKENS else 0,
+        "cached_prompt_tokens": details.get("cached_tokens"),
+    }
+
+    logger.info(
+        "prompt tokens=%s cacheable=%s cached=%s",
+        report["prompt_tokens"], report["cacheable_prompt_tokens"], report["cached_prompt_tokens"]
+    )
+    return report
+
+
+def format_prompt_report(stats):
+    """One-line summary of a per-call prompt report, for display under a message."""
+    parts = [
+        f"{stats['prompt_tokens']} prompt tokens",
+        f"{stats['cacheable_prompt_tokens']} cacheable",
+    ]
+    if stats.get("cached_prompt_tokens") is not None:
+        parts.append(f"{stats['cached_prompt_tokens']} cached")
+    return " · ".join(parts)
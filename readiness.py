@@ -0,0 +1,51 @@
+"""Readiness probe for the chat app.
+
+Asks the running Streamlit server for its health endpoint and exits 0 if it
+answers "ok" and 1 otherwise. Start the server with ``python serve.py`` so it
+only begins listening after the app is warm, then use this as an exec
+readiness probe:
+
+    python readiness.py --port 8501
+
+It only uses the standard library, so each probe stays cheap.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+HEALTH_PATH = "/_stcore/health"
+
+
+def check(host="localhost", port=8501, timeout=2.0):
+    """Query the server's health endpoint and return a report."""
+    report = {"url": f"http://{host}:{port}{HEALTH_PATH}"}
+
+    start = time.perf_counter()
+    with urllib.request.urlopen(report["url"], timeout=timeout) as response:
+        body = response.read().decode("utf-8", "replace").strip()
+    report["seconds"] = round(time.perf_counter() - start, 4)
+
+    report["ready"] = body == "ok"
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the chat app's Streamlit server is ready")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("STREAMLIT_SERVER_PORT", "8501")))
+    parser.add_argument("--timeout", type=float, default=2.0, help="Seconds to wait for an answer")
+    args = parser.parse_args(argv)
+
+    try:
+        report = check(args.host, args.port, args.timeout)
+    except Exception as e:
+        report = {"ready": False, "error": str(e)}
+    print(json.dumps(report))
+    return 0 if report["ready"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import re
+from collections import namedtuple
+
+ResponsePolicy = namedtuple("ResponsePolicy", ["name", "max_tokens", "instruction"])
+
+RESPONSE_POLICIES = {
+    "brief": ResponsePolicy(
+        "brief",
+        400,
+        "Please answer concisely and directly in a few sentences or a short list. Keep it under 150 words."
+    ),
+    "standard": ResponsePolicy(
+        "standard",
+        1200,
+        "Please provide a clear, well-structured response with the key details and an example where it helps. Aim for about 200-350 words."
+    ),
+    "detailed": ResponsePolicy(
+        "detailed",
+        3000,
+        "Please provide an in-depth, comprehensive response with specific details, examples, and thorough explanations. Aim for at least 400-600 words that thoroughly cover multiple aspects of the question."
+    ),
+}
+
+DEFAULT_POLICY = "standard"
+
+# Explicit requests from the user beat the query's shape and length
+BRIEF_REQUEST = re.compile(
+    r"\b(brief|briefly|short answer|concise|concisely|quick question|tl;?dr|in (one|a) (sentence|line|word)|one-liner)\b",
+    re.IGNORECASE
+)
+DETAILED_REQUEST = re.compile(
+    r"\b(detailed|in detail|in-depth|in depth|comprehensive|thorough|thoroughly|elaborate|step[- ]by[- ]step|deep dive)\b",
+    re.IGNORECASE
+)
+
+# Query shapes that usually need a short or a long answer. "How do I ..." questions
+# aren't listed: short ones are usually answered well by a standard-length reply
+BRIEF_QUERY = re.compile(
+    r"^\s*(what is|what's|who is|who was|when is|when was|when did|where is|define|is|are|can|does|do|did|how many|how much)\b",
+    re.IGNORECASE
+)
+DETAILED_QUERY = re.compile(
+    r"\b(explain|compare|comparison|plan|itinerary|guide|design|architecture|pros and cons|trade-?offs|strategy)\b",
+    re.IGNORECASE
+)
+
+# Word counts at which a query is considered short or long
+SHORT_QUERY_WORDS = 8
+LONG_QUERY_WORDS = 40
+
+
+def classify_query(query, default=DEFAULT_POLICY):
+    """Pick a response length bucket for a query from explicit requests, its shape and its length."""
+    # Asking for detail is more specific than asking for brevity, so it wins when both appear
+    if DETAILED_REQUEST.search(query):
+        return "detailed"
+    if BRIEF_REQUEST.search(query):
+        return "brief"
+
+    word_count = len(query.split())
+    if word_count >= LONG_QUERY_WORDS or DETAILED_QUERY.search(query):
+        return "detailed"
+    if word_count <= SHORT_QUERY_WORDS and BRIEF_QUERY.search(query):
+        return "brief"
+    return default
+
+
+def select_response_policy(query, default=DEFAULT_POLICY):
+    """Return the ResponsePolicy to use for a query."""
+    return RESPONSE_POLICIES[classify_query(query, default)]
+
+
+def summarize_by_policy(stats_list):
+    """Aggregate generated tokens and latency per policy bucket from per-call stats dicts."""
+    buckets = {}
+    for stats in stats_list:
+        name = stats.get("response_policy")
+        if name is None:
+            continue
+        bucket = buckets.setdefault(name, {"count": 0, "completion_tokens": 0, "latency": 0.0})
+        bucket["count"] += 1
+        bucket["completion_tokens"] += stats.get("completion_tokens") or 0
+        bucket["latency"] += stats.get("llm_latency") or 0.0
+
+    return {
+        name: {
+            "count": bucket["count"],
+            "avg_completion_tokens": round(bucket["completion_tokens"] / bucket["count"], 1),
+            "avg_latency": round(bucket["latency"] / bucket["count"], 4),
+        }
+        for name, bucket in buckets.items()
+    }
@@ -0,0 +1,35 @@
+"""Start the Streamlit server with the app already warm.
+
+Imports the app and warms the LLM client, the agent registry and the router
+in the serving process, then starts the server in that same process, so the
+first user doesn't pay for the warm-up. Extra arguments are passed on to
+``streamlit run``:
+
+    python serve.py --server.port 8501
+"""
+import os
+import sys
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "final_chat_app_with_history.py")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    # Warming up outside a script run is expected here, so skip Streamlit's "use streamlit run" warning
+    from streamlit import config
+    config.set_option("global.showWarningOnDirectExecution", False)
+
+    # Heavy imports, tiktoken encodings and the search backend are cached process-wide,
+    # so the server's script runs reuse them
+    import final_chat_app_with_history as app
+    app.warm_up()
+
+    # The server only starts listening once the warm-up is done
+    from streamlit.web import cli
+    sys.argv = ["streamlit", "run", APP_SCRIPT, *argv]
+    return cli.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Shared state for running several app replicas behind a load balancer.
+
+When SHARED_STATE_URL is set, conversations, per-user session fields and the
+search result cache live in an external Redis-compatible store instead of
+a single process. ``memory://`` selects an in-process stand-in for tests and
+local development; ``redis://`` and ``rediss://`` URLs use redis-py.
+"""
+import fnmatch
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+
+from conversation_storage import DEFAULT_CODEC, compress_messages
+
+NAMESPACE = os.environ.get("SHARED_STATE_NAMESPACE", "agent-squad")
+
+# Session fields restored when a user comes back on any replica
+SESSION_FIELDS = ("used_agents", "active_agent", "current_conversation_id", "conversation_title")
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return str(value).encode("utf-8")
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of the redis-py client used here.
+
+    Like redis-py without decode_responses, keys and values come back as bytes.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _expire_if_needed(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def get(self, name):
+        name = _to_bytes(name)
+        with self._lock:
+            self._expire_if_needed(name)
+            value = self._data.get(name)
+            return value if isinstance(value, bytes) else None
+
+    def set(self, name, value, ex=None):
+        name = _to_bytes(name)
+        with self._lock:
+            self._data[name] = _to_bytes(value)
+            if ex is not None:
+                self._expires[name] = time.time() + ex
+            else:
+                self._expires.pop(name, None)
+        return True
+
+    def delete(self, *names):
+        removed = 0
+        with self._lock:
+            for name in map(_to_bytes, names):
+                self._expire_if_needed(name)
+                if self._data.pop(name, None) is not None:
+                    removed += 1
+                self._expires.pop(name, None)
+        return removed
+
+    def hget(self, name, key):
+        name = _to_bytes(name)
+        with self._lock:
+            self._expire_if_needed(name)
+            return self._data.get(name, {}).get(_to_bytes(key))
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        name = _to_bytes(name)
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        with self._lock:
+            self._expire_if_needed(name)
+            hash_ = self._data.setdefault(name, {})
+            added = 0
+            for field, field_value in items.items():
+                field = _to_bytes(field)
+                if field not in hash_:
+                    added += 1
+                hash_[field] = _to_bytes(field_value)
+            return added
+
+    def hgetall(self, name):
+        name = _to_bytes(name)
+        with self._lock:
+            self._expire_if_needed(name)
+            return dict(self._data.get(name, {}))
+
+    def hdel(self, name, *keys):
+        name = _to_bytes(name)
+        with self._lock:
+            hash_ = self._data.get(name, {})
+            return sum(1 for key in keys if hash_.pop(_to_bytes(key), None) is not None)
+
+    def hscan_iter(self, name, match=None, count=None):
+        for field, value in self.hgetall(name).items():
+            if match is None or fnmatch.fnmatchcase(field.decode("utf-8"), match):
+                yield field, value
+
+
+class SharedStateStore:
+    """Conversations, session fields and cache entries kept in a Redis-compatible client."""
+
+    def __init__(self, client, namespace=NAMESPACE):
+        self.client = client
+        self.namespace = namespace
+
+    def _key(self, *parts):
+        return ":".join((self.namespace,) + parts)
+
+    # Conversations: metadata and compressed messages live in two hashes per user
+
+    def save_conversation(self, user_key, conv_id, conv_data):
+        """Store a conversation entry, compressing its messages."""
+        if "compressed_messages" in conv_data:
+            blob, codec = conv_data["compressed_messages"], conv_data.get("codec", "zlib")
+        else:
+            blob, codec = compress_messages(conv_data["messages"]), DEFAULT_CODEC
+        meta = {
+            "title": conv_data.get("title", ""),
+            "timestamp": conv_data.get("timestamp", ""),
+            "last_active": conv_data.get("last_active", 0),
+            "codec": codec,
+        }
+        self.client.hset(self._key("user", user_key, "messages"), conv_id, blob)
+        self.client.hset(self._key("user", user_key, "conversations"), conv_id, json.dumps(meta))
+
+    def delete_conversation(self, user_key, conv_id):
+        self.client.hdel(self._key("user", user_key, "conversations"), conv_id)
+        self.client.hdel(self._key("user", user_key, "messages"), conv_id)
+
+    def iter_conversations(self, user_key):
+        """Yield (conversation id, compressed entry) pairs one at a time."""
+        messages_key = self._key("user", user_key, "messages")
+        for conv_id, meta in self.client.hscan_iter(self._key("user", user_key, "conversations")):
+            conv_id = conv_id.decode("utf-8") if isinstance(conv_id, bytes) else conv_id
+            blob = self.client.hget(messages_key, conv_id)
+            if blob is None:
+                continue
+            conv_data = json.loads(meta)
+            conv_data["compressed_messages"] = blob
+            yield conv_id, conv_data
+
+    def load_conversations(self, user_key):
+        """Load all conversations of a user as compressed entries, decompressed lazily on Load."""
+        return dict(self.iter_conversations(user_key))
+
+    # Session fields
+
+    def save_session(self, user_key, fields):
+        self.client.hset(
+            self._key("user", user_key, "session"),
+            mapping={name: json.dumps(value) for name, value in fields.items()}
+        )
+
+    def load_session(self, user_key):
+        raw = self.client.hgetall(self._key("user", user_key, "session"))
+        return {
+            (name.decode("utf-8") if isinstance(name, bytes) else name): json.loads(value)
+            for name, value in raw.items()
+        }
+
+    # Cache entries
+
+    def cache_get(self, key):
+        value = self.client.get(self._key("cache", key))
+        return None if value is None else json.loads(value)
+
+    def cache_set(self, key, value, ttl):
+        self.client.set(self._key("cache", key), json.dumps(value), ex=ttl)
+
+
+@lru_cache(maxsize=None)
+def _local_client(url):
+    # One stand-in per URL so every session in this process shares it
+    return LocalRedis()
+
+
+def connect(url):
+    """Create a store client for a shared state URL."""
+    if url.startswith("memory://"):
+        return _local_client(url)
+    import redis
+
+    return redis.Redis.from_url(url)
+
+
+@lru_cache(maxsize=1)
+def get_shared_store():
+    """Return the configured shared store, or None when running single-process."""
+    url = os.environ.get("SHARED_STATE_URL", "")
+    if not url:
+        return None
+    return SharedStateStore(connect(url))
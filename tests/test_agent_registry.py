@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from agent_registry import load_agent_registry, validate_agent_specs
+
+AGENTS_TOML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agents.toml")
+
+
+class FakeAgent:
+    def __init__(self, name, description, system_prompt, icon, color, agent_id=None, keywords=(), **options):
+        self.id = agent_id
+        self.name = name
+        self.keywords = list(keywords)
+        self.options = options
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return load_agent_registry(AGENTS_TOML, FakeAgent)
+
+
+def _spec(agent_id, **fields):
+    spec = {
+        "id": agent_id,
+        "name": agent_id.title(),
+        "description": "An agent",
+        "icon": "🤖",
+        "color": "#123456",
+        "system_prompt": "You are helpful.",
+    }
+    spec.update(fields)
+    return spec
+
+
+def test_load_agent_registry_indexes_agents(registry):
+    assert len(registry) == 4
+    assert registry.by_id["tech"] is registry.get("Tech Expert")
+    assert registry.get("Nobody") is None
+    assert registry.default.id == "general"
+    assert registry.by_id["travel"].options["response_length"] == "detailed"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Plan a trip to Rome and book a hotel", "travel"),
+    ("My python function throws an error", "tech"),
+    # Keywords match at word starts, so plural and longer forms still count
+    ("Best hotels for a vacation", "travel"),
+    ("I'm learning programming", "tech"),
+    # ...but not inside other words: "api" is not in "capital", nor "app" in "happy"
+    ("I'm happy about my capital gains", "general"),
+    # Ties and queries without keywords go to the default agent
+    ("Any programming tips for hotels?", "general"),
+    ("Tell me a joke", "general"),
+])
+def test_select_routes_by_keywords(registry, query, expected):
+    assert registry.select(query).id == expected
+
+
+def test_validate_agent_specs_accepts_valid_specs():
+    validate_agent_specs([_spec("a", default=True), _spec("b", keywords=["x"], response_length="brief")])
+
+
+@pytest.mark.parametrize("specs, message", [
+    ([], "No agents defined"),
+    ([_spec("a", default=True, system_prompt="")], "missing system_prompt"),
+    ([_spec("a", default=True, colour="#123456")], "unknown fields: colour"),
+    ([_spec("a", default=True), _spec("a", name="Other")], "Duplicate agent id"),
+    ([_spec("a", default=True), _spec("b", name="A")], "Duplicate agent name"),
+    ([_spec("a", default=True, color="red")], "invalid color"),
+    ([_spec("a", default=True, response_length="epic")], "unknown response_length"),
+    ([_spec("a"), _spec("b")], "found 0"),
+    ([_spec("a", default=True), _spec("b", default=True)], "found 2"),
+])
+def test_validate_agent_specs_rejects_invalid_specs(specs, message):
+    with pytest.raises(ValueError, match=message):
+        validate_agent_specs(specs)
@@ -0,0 +1,104 @@
+import json
+from types import SimpleNamespace
+
+from batch_eval import load_checkpoint, repair_checkpoint, run_batch
+from mock_llm import MockChatCompletion
+
+
+class FakeApp:
+    """Stand-in for the app module: routes by a fixed table and can fail some queries."""
+
+    def __init__(self, failing=(), crashing=()):
+        self.failing = set(failing)
+        self.crashing = set(crashing)
+        self.queries = []
+
+    async def route_query(self, query, session_id, message_history, stats=None):
+        self.queries.append(query)
+        if query in self.crashing:
+            raise RuntimeError("boom")
+        agent = SimpleNamespace(name="Tech Expert" if "python" in query else "General Assistant")
+        if query in self.failing:
+            # Agent.process reports API failures as an error reply rather than raising
+            return "Error: Rate limit reached (429)", agent
+        stats.update(response_policy="brief", completion_tokens=10, llm_latency=0.01)
+        return f"Answer to {query}", agent
+
+
+def _write_corpus(path, queries):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, query in enumerate(queries, 1):
+            f.write(json.dumps({"id": str(i), "query": query, "expected_agent": "Tech Expert"}) + "\n")
+
+
+def _read_results(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_run_batch_resumes_and_retries_failures(tmp_path):
+    corpus = tmp_path / "corpus.jsonl"
+    output = tmp_path / "results.jsonl"
+    _write_corpus(corpus, ["python lists", "python dicts", "weather", "python sets"])
+
+    app = FakeApp(failing={"python dicts"}, crashing={"weather"})
+    summary = run_batch(app, str(corpus), str(output), workers=2)
+    assert summary["processed"] == 4
+    assert summary["errors"] == 2
+    assert len(_read_results(output)) == 4
+
+    # Only the failed and crashed items run again, and the summary covers the whole corpus
+    app = FakeApp()
+    summary = run_batch(app, str(corpus), str(output), workers=2)
+    assert sorted(app.queries) == ["python dicts", "weather"]
+    assert summary["processed"] == 2
+    assert summary["skipped"] == 2
+    assert summary["count"] == 4
+    assert summary["errors"] == 0
+    assert summary["routing_accuracy"] == 0.75
+    assert summary["by_response_policy"]["brief"]["count"] == 4
+
+    # Nothing is left to do on a third run
+    app = FakeApp()
+    summary = run_batch(app, str(corpus), str(output), workers=2)
+    assert app.queries == []
+    assert summary["count"] == 4
+
+
+def test_repair_checkpoint_truncates_partial_last_line(tmp_path):
+    output = tmp_path / "results.jsonl"
+    complete = json.dumps({"id": "1", "error": False}) + "\n"
+    output.write_text(complete + '{"id": "2", "err', encoding="utf-8")
+
+    assert list(load_checkpoint(str(output))) == ["1"]
+    repair_checkpoint(str(output))
+    assert output.read_text(encoding="utf-8") == complete
+
+    # A file that already ends on a full line is left alone
+    repair_checkpoint(str(output))
+    assert output.read_text(encoding="utf-8") == complete
+
+
+def test_load_checkpoint_keeps_latest_result_per_item(tmp_path):
+    output = tmp_path / "results.jsonl"
+    lines = [
+        {"id": "1", "error": True},
+        {"id": "1", "error": False, "response": "ok"},
+        {"id": "2", "error": False, "response": "ok"},
+        {"id": "2", "error": True},
+    ]
+    output.write_text("".join(json.dumps(line) + "\n" for line in lines), encoding="utf-8")
+
+    done = load_checkpoint(str(output))
+    assert list(done) == ["1"]
+    assert load_checkpoint(str(tmp_path / "missing.jsonl")) == {}
+
+
+def test_mock_chat_completion_matches_openai_shape():
+    response = MockChatCompletion.create(
+        model="gpt-4",
+        messages=[{"role": "system", "content": "prompt"}, {"role": "user", "content": "hello"}],
+        max_tokens=100
+    )
+    assert "hello" in response.choices[0].message.content
+    assert response.get("usage")["completion_tokens"] > 0
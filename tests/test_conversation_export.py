@@ -0,0 +1,73 @@
+import io
+
+import pytest
+
+from conversation_export import import_records, iter_encoded_records, iter_export_records, iter_import_records
+from conversation_storage import compress_conversation, get_conversation_messages
+
+
+def _conversation(title="Trip", timestamp="2026-01-01 10:00"):
+    return {
+        "title": title,
+        "timestamp": timestamp,
+        "last_active": 5,
+        "messages": [
+            {"role": "user", "content": "Where should I stay in Rome?"},
+            {"role": "assistant", "content": "Near the Pantheon.", "agent_name": "Travel Agent"},
+        ],
+    }
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "msgpack"])
+def test_export_import_round_trip(fmt):
+    history = {"a": _conversation(), "b": _conversation("Code")}
+    compress_conversation(history["b"])
+
+    fp = io.BytesIO(b"".join(iter_encoded_records(iter_export_records(history, "user-1"), fmt)))
+    restored = {}
+    assert import_records(iter_import_records(fp, fmt), restored) == (2, 0)
+
+    assert restored["a"] == _conversation()
+    assert restored["b"]["title"] == "Code"
+    assert get_conversation_messages("b", restored["b"]) == _conversation()["messages"]
+
+
+@pytest.mark.parametrize("record", [
+    {"title": "No id", "messages": []},
+    {"id": "", "messages": []},
+    {"id": 5, "messages": []},
+    {"id": "a", "messages": "not a list"},
+    {"id": "a", "messages": [{"foo": 1}]},
+    {"id": "a", "messages": [{"role": "system", "content": "hi"}]},
+    {"id": "a", "messages": [{"role": "user", "content": None}]},
+    ["not", "a", "dict"],
+])
+def test_import_skips_invalid_records(record):
+    history = {}
+    assert import_records([record], history) == (0, 1)
+    assert history == {}
+
+
+def test_import_defaults_malformed_fields():
+    history = {}
+    records = [
+        {"id": "a", "title": None, "timestamp": 5, "last_active": "yesterday", "messages": []},
+        {"id": "b", "timestamp": None, "last_active": True, "messages": []},
+    ]
+    assert import_records(records, history) == (2, 0)
+
+    for conv_data in history.values():
+        assert conv_data["title"] == "Untitled Chat"
+        assert conv_data["timestamp"] == ""
+        assert conv_data["last_active"] == 0
+
+    # The sidebar sorts conversations by timestamp
+    sorted(history.values(), key=lambda c: c["timestamp"])
+
+
+def test_import_can_compress_entries():
+    history = {}
+    record = dict(_conversation(), id="a")
+    assert import_records([record], history, compress=True) == (1, 0)
+    assert "messages" not in history["a"]
+    assert get_conversation_messages("a", history["a"]) == record["messages"]
@@ -0,0 +1,63 @@
+from conversation_storage import (
+    HotConversationCache,
+    compress_conversation,
+    compress_idle_conversations,
+    compress_messages,
+    decompress_messages,
+    get_conversation_messages,
+    is_compressed,
+)
+
+
+def _messages(n):
+    return [{"role": "assistant", "content": f"answer {i} " * 50, "agent_name": "Tech Expert"} for i in range(n)]
+
+
+def test_compress_idle_conversations_skips_recent_and_current():
+    history = {
+        "old": {"title": "Old", "messages": _messages(2), "last_active": 0},
+        "recent": {"title": "Recent", "messages": _messages(2), "last_active": 990},
+        "current": {"title": "Current", "messages": _messages(2), "last_active": 0},
+    }
+    assert compress_idle_conversations(history, now=1000, skip_id="current", idle_seconds=60) == 1
+    assert is_compressed(history["old"])
+    assert not is_compressed(history["recent"])
+    assert not is_compressed(history["current"])
+
+
+def test_get_conversation_messages_uses_hot_cache():
+    messages = _messages(2)
+    history = {"a": {"messages": messages, "last_active": 0}, "b": {"messages": _messages(1), "last_active": 0}}
+    compress_idle_conversations(history, now=1000, idle_seconds=0)
+
+    hot = HotConversationCache(max_size=1)
+    loaded = get_conversation_messages("a", history["a"], hot)
+    assert loaded == messages
+    assert get_conversation_messages("a", history["a"], hot) is loaded
+
+    # Loading another conversation evicts the least recently used one
+    get_conversation_messages("b", history["b"], hot)
+    assert hot.get("a") is None
+
+
+def test_compress_messages_round_trip():
+    messages = _messages(3) + [{"role": "user", "content": "Ciao, città 🌍"}]
+    blob = compress_messages(messages, codec="zlib")
+    assert len(blob) < len(str(messages))
+    assert decompress_messages(blob, codec="zlib") == messages
+
+
+def test_compress_conversation_keeps_metadata():
+    conv_data = {"title": "Trip", "timestamp": "2026-01-01 10:00", "messages": _messages(2), "last_active": 0}
+    compress_conversation(conv_data)
+    compress_conversation(conv_data)
+    assert set(conv_data) == {"title", "timestamp", "last_active", "compressed_messages", "codec"}
+    assert get_conversation_messages("a", conv_data) == _messages(2)
+
+
+def test_hot_cache_discard():
+    hot = HotConversationCache(max_size=2)
+    hot.put("a", [])
+    hot.discard("a")
+    hot.discard("missing")
+    assert hot.get("a") is None
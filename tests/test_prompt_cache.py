@@ -0,0 +1,42 @@
+import prompt_cache
+from prompt_cache import (
+    PROMPT_CACHE_MIN_TOKENS,
+    TOKENS_PER_REPLY,
+    build_prompt_report,
+    count_message_tokens,
+    format_prompt_report,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "Where should I stay in Rome?"},
+]
+
+
+def test_build_prompt_report_prefers_provider_usage(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the prompt should not be tokenized when usage is reported")
+
+    monkeypatch.setattr(prompt_cache, "count_message_tokens", fail)
+    usage = {"prompt_tokens": 1500, "prompt_tokens_details": {"cached_tokens": 1024}}
+    report = build_prompt_report(1200, MESSAGES, usage)
+    assert report == {"prompt_tokens": 1500, "cacheable_prompt_tokens": 1200, "cached_prompt_tokens": 1024}
+
+
+def test_build_prompt_report_counts_tokens_without_usage():
+    report = build_prompt_report(PROMPT_CACHE_MIN_TOKENS, MESSAGES)
+    assert report["prompt_tokens"] == count_message_tokens(MESSAGES) + TOKENS_PER_REPLY
+    assert report["cached_prompt_tokens"] is None
+
+
+def test_short_prefixes_are_not_cacheable():
+    report = build_prompt_report(PROMPT_CACHE_MIN_TOKENS - 1, MESSAGES, {"prompt_tokens": 1100})
+    assert report["cacheable_prompt_tokens"] == 0
+    assert build_prompt_report(PROMPT_CACHE_MIN_TOKENS, MESSAGES)["cacheable_prompt_tokens"] == PROMPT_CACHE_MIN_TOKENS
+
+
+def test_format_prompt_report():
+    stats = {"prompt_tokens": 1500, "cacheable_prompt_tokens": 1200, "cached_prompt_tokens": None}
+    assert format_prompt_report(stats) == "1500 prompt tokens · 1200 cacheable"
+    stats["cached_prompt_tokens"] = 1024
+    assert format_prompt_report(stats) == "1500 prompt tokens · 1200 cacheable · 1024 cached"
@@ -0,0 +1,56 @@
+import pytest
+
+from response_policy import RESPONSE_POLICIES, classify_query, select_response_policy, summarize_by_policy
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What is a closure?", "brief"),
+    ("Give me a brief overview of Rome's history and architecture", "brief"),
+    ("Plan a five day trip to Japan", "detailed"),
+    ("Explain how TLS works", "detailed"),
+    ("I have a bug in my code", "standard"),
+    ("Tell me something about Rome, in detail", "detailed"),
+    # Short how-to questions are not detailed by shape alone
+    ("How do I reverse a list in Python?", "standard"),
+    ("How to center a div?", "standard"),
+    # Long queries are detailed whatever their shape
+    ("How do I " + "set up this thing " * 10, "detailed"),
+])
+def test_classify_query(query, expected):
+    assert classify_query(query) == expected
+
+
+@pytest.mark.parametrize("query, expected", [
+    # A request for detail wins over a request for brevity
+    ("Can you quickly give a detailed, step by step guide to deploying Django?", "detailed"),
+    ("Briefly, but in detail, explain how DNS works", "detailed"),
+    # A request for brevity wins over a query shape that would otherwise be detailed
+    ("Briefly explain how TLS works", "brief"),
+    ("tl;dr compare Rust and Go", "brief"),
+])
+def test_classify_query_explicit_requests(query, expected):
+    assert classify_query(query) == expected
+
+
+def test_classify_query_falls_back_to_agent_default():
+    assert classify_query("I have a bug in my code", default="detailed") == "detailed"
+    assert classify_query("How do I reverse a list in Python?", default="brief") == "brief"
+
+
+def test_select_response_policy_sets_max_tokens():
+    policy = select_response_policy("What is a closure?")
+    assert policy is RESPONSE_POLICIES["brief"]
+    assert policy.max_tokens < RESPONSE_POLICIES["standard"].max_tokens < RESPONSE_POLICIES["detailed"].max_tokens
+
+
+def test_summarize_by_policy():
+    stats = [
+        {"response_policy": "brief", "completion_tokens": 100, "llm_latency": 1.0},
+        {"response_policy": "brief", "completion_tokens": 200, "llm_latency": 2.0},
+        {"response_policy": "detailed", "completion_tokens": 900, "llm_latency": 6.0},
+        {},
+    ]
+    assert summarize_by_policy(stats) == {
+        "brief": {"count": 2, "avg_completion_tokens": 150.0, "avg_latency": 1.5},
+        "detailed": {"count": 1, "avg_completion_tokens": 900.0, "avg_latency": 6.0},
+    }
@@ -0,0 +1,51 @@
+from conversation_storage import get_conversation_messages, is_compressed
+from shared_state import LocalRedis, SharedStateStore, connect
+
+
+def _messages(n):
+    return [{"role": "assistant", "content": f"answer {i} " * 50, "agent_name": "Tech Expert"} for i in range(n)]
+
+
+def test_shared_state_store_round_trip():
+    store = SharedStateStore(LocalRedis(), namespace="test")
+    messages = _messages(3)
+    store.save_conversation("user-1", "conv-1", {
+        "title": "Trip", "timestamp": "2026-01-01 10:00", "last_active": 5, "messages": messages
+    })
+
+    conversations = store.load_conversations("user-1")
+    assert list(conversations) == ["conv-1"]
+    assert conversations["conv-1"]["title"] == "Trip"
+    assert is_compressed(conversations["conv-1"])
+    assert get_conversation_messages("conv-1", conversations["conv-1"]) == messages
+    assert store.load_conversations("user-2") == {}
+
+
+def test_shared_state_store_session_and_cache():
+    store = SharedStateStore(LocalRedis(), namespace="test")
+    store.save_session("user-1", {"used_agents": ["Tech Expert"], "active_agent": None})
+    assert store.load_session("user-1") == {"used_agents": ["Tech Expert"], "active_agent": None}
+
+    store.cache_set("key", [1, 2], ttl=60)
+    assert store.cache_get("key") == [1, 2]
+    assert store.cache_get("missing") is None
+
+
+def test_shared_state_store_delete_and_namespaces():
+    client = LocalRedis()
+    store = SharedStateStore(client, namespace="a")
+    other = SharedStateStore(client, namespace="b")
+    conv = {"title": "Trip", "timestamp": "", "last_active": 0, "messages": _messages(1)}
+    store.save_conversation("user-1", "conv-1", conv)
+    other.save_conversation("user-1", "conv-2", conv)
+
+    assert list(store.load_conversations("user-1")) == ["conv-1"]
+    store.delete_conversation("user-1", "conv-1")
+    assert store.load_conversations("user-1") == {}
+    assert list(other.load_conversations("user-1")) == ["conv-2"]
+
+
+def test_connect_memory_url():
+    store = SharedStateStore(connect("memory://"))
+    store.cache_set("key", {"a": 1}, ttl=60)
+    assert store.cache_get("key") == {"a": 1}
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import web_search
+from web_search import SearchCache, StubSearchBackend, format_search_context, search, search_many
+
+
+def test_search_cache_normalizes_queries():
+    cache = SearchCache(ttl=60)
+    cache.set("  Best   HOTELS in Rome ", [{"url": "a"}])
+    assert cache.get("best hotels in rome") == [{"url": "a"}]
+
+
+def test_search_cache_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(web_search.time, "time", lambda: now[0])
+    cache = SearchCache(ttl=60)
+    cache.set("query", [{"url": "a"}])
+
+    now[0] += 59
+    assert cache.get("query") == [{"url": "a"}]
+    now[0] += 2
+    assert cache.get("query") is None
+
+
+def test_search_cache_sweeps_expired_entries_on_set(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(web_search.time, "time", lambda: now[0])
+    cache = SearchCache(ttl=60)
+    for i in range(10):
+        cache.set(f"query {i}", [])
+
+    # Expired entries go away without being read again
+    now[0] += 61
+    cache.set("fresh", [])
+    assert list(cache._entries) == ["fresh"]
+
+
+def test_search_cache_is_bounded():
+    cache = SearchCache(ttl=60, max_entries=3)
+    for i in range(5):
+        cache.set(f"query {i}", [i])
+
+    assert len(cache._entries) == 3
+    assert cache.get("query 0") is None
+    assert cache.get("query 4") == [4]
+
+    # Setting an existing key again makes it the newest
+    cache.set("query 2", [2])
+    cache.set("query 5", [5])
+    assert cache.get("query 2") == [2]
+    assert cache.get("query 3") is None
+
+
+def test_format_search_context_stops_at_token_budget():
+    results = [
+        {"title": f"Title {i}", "url": f"https://example.com/{i}", "snippet": "word " * 40}
+        for i in range(10)
+    ]
+    context = format_search_context(results, token_budget=120)
+    lines = [line for line in context.splitlines() if line.startswith("- ")]
+    assert 0 < len(lines) < len(results)
+    assert "https://example.com/0" in context
+    assert format_search_context(results, token_budget=1) == ""
+
+
+def test_search_many_merges_fan_out_and_uses_cache():
+    backend = StubSearchBackend()
+    cache = SearchCache(ttl=60)
+
+    results = asyncio.run(search_many(["Paris", "Paris travel guide"], backend, cache))
+    assert len(results) == 2
+    assert len({r["url"] for r in results}) == 2
+
+    asyncio.run(search("paris", backend, cache))
+    assert backend.calls == ["Paris", "Paris travel guide"]
+
+
+def test_search_treats_store_errors_as_cache_miss():
+    class FailingStore:
+        def cache_get(self, key):
+            raise ConnectionError("store down")
+
+        def cache_set(self, key, value, ttl):
+            raise ConnectionError("store down")
+
+    results = asyncio.run(search("query", StubSearchBackend(), SearchCache(store=FailingStore())))
+    assert len(results) == 1
+
+
+def test_search_times_out_without_results():
+    release = threading.Event()
+
+    class HangingBackend:
+        def search(self, query):
+            release.wait(5)
+            return [{"title": "late", "url": "https://example.com/late", "snippet": ""}]
+
+    cache = SearchCache(ttl=60)
+    try:
+        assert asyncio.run(search("query", HangingBackend(), cache, timeout=0.05)) == []
+    finally:
+        release.set()
+    assert cache.get("query") is None